@@ -1,4 +0,0 @@
-#!/bin/env python3
-
-from alpaca.main_old import main
-main()
@@ -0,0 +1,8 @@
+def __getattr__(name: str):
+    # The version is only looked up when it is accessed, so importing alpaca stays cheap
+    if name == "__version__":
+        from alpaca.common.alpaca_version import get_alpaca_version
+
+        return get_alpaca_version()
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
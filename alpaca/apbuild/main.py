@@ -1,10 +1,11 @@
 from argparse import ArgumentParser, Namespace
+from typing import TYPE_CHECKING
 
 from alpaca.common.alpaca_application import handle_main
 from alpaca.common.logging import logger
-from alpaca.common.repository_cache import RepositoryCache
-from alpaca.configuration.configuration import Configuration
-from alpaca.recipes.recipe_context import RecipeContext
+
+if TYPE_CHECKING:
+    from alpaca.configuration.configuration import Configuration
 
 
 def _create_arg_parser(parser: ArgumentParser) -> ArgumentParser:
@@ -31,7 +32,11 @@ def _create_arg_parser(parser: ArgumentParser) -> ArgumentParser:
     return parser
 
 
-def _build_main(args: Namespace, config: Configuration):
+def _build_main(args: Namespace, config: "Configuration"):
+    # Imported here so that --help and argument errors don't pay for loading the build machinery
+    from alpaca.common.repository_cache import RepositoryCache
+    from alpaca.recipes.recipe_context import RecipeContext
+
     repo_cache = RepositoryCache(config)
 
     recipe_path = repo_cache.find_recipe(args.package)
@@ -40,7 +45,7 @@ def _build_main(args: Namespace, config: Configuration):
         raise FileNotFoundError(f"Could not find recipe for package '{args.package}'.")
 
     logger.info(f"Installing package: {recipe_path}")
-    logger.debug(f"Full path: {recipe_path}")
+    logger.debug("Full path: %s", recipe_path)
 
     context = RecipeContext(config, recipe_path)
     context.create_package()
@@ -1,24 +1,46 @@
+import sys
 from argparse import ArgumentParser, Namespace
+from typing import Callable, TYPE_CHECKING
 
 from alpaca.common.alpaca_application import handle_main
-from alpaca.configuration.configuration import Configuration
-from alpaca.recipes.package_file_info import write_file_info
+
+if TYPE_CHECKING:
+    from alpaca.configuration.configuration import Configuration
+
+
+def _add_fileinfo_arguments(parser: ArgumentParser):
+    parser.add_argument("package_dir", type=str, help="The package directory of the current build context.")
+
+
+# Maps each command to its help text and a callback that adds the command specific arguments. The arguments are only
+# added for the command that was actually given on the command line.
+_commands: dict[str, tuple[str, Callable[[ArgumentParser], None]]] = {
+    "fileinfo": ("Generate a .fileinfo file for a given package or recipe file.", _add_fileinfo_arguments),
+}
+
+
+def _find_selected_command(argv: list[str]) -> str | None:
+    return next((arg for arg in argv if arg in _commands), None)
 
 
 def _create_arg_parser(parser: ArgumentParser) -> ArgumentParser:
     subparsers = parser.add_subparsers(dest="command", required=True)
 
-    fileinfo_parser = subparsers.add_parser("fileinfo",
-                                            help="Generate a .fileinfo file for a given package or recipe file.")
+    selected_command = _find_selected_command(sys.argv[1:])
 
-    fileinfo_parser.add_argument("package_dir", type=str,
-                                 help="The package directory of the current build context.")
+    for command, (help_text, add_arguments_callback) in _commands.items():
+        command_parser = subparsers.add_parser(command, help=help_text)
+
+        if command == selected_command:
+            add_arguments_callback(command_parser)
 
     return parser
 
 
-def _command_main(args: Namespace, config: Configuration):
+def _command_main(args: Namespace, config: "Configuration"):
     if args.command == "fileinfo":
+        from alpaca.recipes.package_file_info import write_file_info
+
         write_file_info(args.package_dir)
 
 
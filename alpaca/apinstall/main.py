@@ -1,8 +1,10 @@
 from argparse import ArgumentParser, Namespace
-from os.path import exists
+from typing import TYPE_CHECKING
 
 from alpaca.common.alpaca_application import handle_main
-from alpaca.configuration.configuration import Configuration
+
+if TYPE_CHECKING:
+    from alpaca.configuration.configuration import Configuration
 
 
 def _create_arg_parser(parser: ArgumentParser) -> ArgumentParser:
@@ -12,7 +14,9 @@ def _create_arg_parser(parser: ArgumentParser) -> ArgumentParser:
     return parser
 
 
-def _install_main(args: Namespace, config: Configuration):
+def _install_main(args: Namespace, config: "Configuration"):
+    from os.path import exists
+
     package_path = args.package
 
     if not package_path.endswith(config.package_file_extension):
@@ -1,7 +1,10 @@
 from argparse import ArgumentParser, Namespace
+from typing import TYPE_CHECKING
+
 from alpaca.common.alpaca_application import handle_main
-from alpaca.common.repository_cache import RepositoryCache
-from alpaca.configuration.configuration import Configuration
+
+if TYPE_CHECKING:
+    from alpaca.configuration.configuration import Configuration
 
 
 def _create_arg_parser(parser: ArgumentParser) -> ArgumentParser:
@@ -10,7 +13,9 @@ def _create_arg_parser(parser: ArgumentParser) -> ArgumentParser:
     return parser
 
 
-def _update_main(args: Namespace, config: Configuration):
+def _update_main(args: Namespace, config: "Configuration"):
+    from alpaca.common.repository_cache import RepositoryCache
+
     repository_cache = RepositoryCache(config)
 
     if not args.reset:
@@ -1,33 +1,61 @@
-import importlib.metadata
-from argparse import ArgumentParser, Namespace
-from os import getuid
+import sys
+from argparse import Action, ArgumentParser, Namespace, SUPPRESS
+from functools import lru_cache
+from os import environ, getcwd, geteuid
+from typing import Callable, TYPE_CHECKING
 
-__version__ = importlib.metadata.version("aleya-alpaca")
+from alpaca.common.alpaca_version import get_alpaca_version
+from alpaca.common.logging import enable_verbose_logging, logger
 
-from typing import Callable
+if TYPE_CHECKING:
+    from alpaca.configuration.configuration import Configuration
 
-from alpaca.common.logging import enable_verbose_logging, logger
-from alpaca.configuration.configuration import Configuration
+
+class _VersionAction(Action):
+    """
+    Print the version of alpaca and exit. Unlike argparse's builtin version action, the version is only looked up
+    when the flag is actually given.
+    """
+
+    def __init__(self, option_strings, dest=SUPPRESS, default=SUPPRESS, help=None):
+        super().__init__(option_strings=option_strings, dest=dest, default=default, nargs=0, help=help)
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        # Like argparse's builtin version action, the version is printed to stdout, so it can be captured
+        parser._print_message(f"AlpaCA version: {get_alpaca_version()}\n", sys.stdout)
+        parser.exit()
 
 
 def _create_arg_parser_for_application(application_name: str) -> ArgumentParser:
     parser = ArgumentParser(
-        description=f"AlpaCA {application_name} - The Aleya Package Configuration Assistant ({__version__})")
+        description=f"AlpaCA {application_name} - The Aleya Package Configuration Assistant")
 
     parser.add_argument("--verbose", "-v", action="store_true", help="Enable verbose output")
 
-    parser.add_argument("--version", action="version", version=f"AlpaCA version: {__version__}")
+    parser.add_argument("--version", action=_VersionAction, help="Show the version of alpaca and exit")
 
     return parser
 
 
-def _create_configuration_for_application(args: Namespace):
-    return Configuration.create_application_config(args)
+@lru_cache(maxsize=8)
+def _create_cached_configuration(arguments: tuple, working_directory: str, environment: tuple) -> "Configuration":
+    from alpaca.configuration.configuration import Configuration
+
+    return Configuration.create_application_config(Namespace(**dict(arguments)))
+
+
+def _create_configuration_for_application(args: Namespace) -> "Configuration":
+    # The configuration only depends on the arguments, the working directory (for the default paths) and the
+    # ALPACA_ environment variables, so it is only created once when handle_main runs multiple times in one process
+    return _create_cached_configuration(
+        tuple(sorted(vars(args).items())),
+        getcwd(),
+        tuple(sorted((key, value) for key, value in environ.items() if key.startswith("ALPACA_"))))
 
 
 def handle_main(application_name: str, require_root: bool, disallow_root: bool,
                 create_arguments_callback: Callable[[ArgumentParser], ArgumentParser],
-                main_function_callback: Callable[[Namespace, Configuration], None]):
+                main_function_callback: Callable[[Namespace, "Configuration"], None]):
     """
     A decorator to handle the main function of an application, ensuring that it is run with the correct user permissions.
 
@@ -44,7 +72,8 @@ def handle_main(application_name: str, require_root: bool, disallow_root: bool,
 
         args = parser.parse_args()
 
-        # Hack to ensure that verbose logs from the configuration module are printed
+        # Verbose output can only be enabled from the command line, so enable it before loading the configuration
+        # to also see the verbose logs of the configuration module
         if args.verbose:
             enable_verbose_logging()
 
@@ -52,10 +81,8 @@ def handle_main(application_name: str, require_root: bool, disallow_root: bool,
 
         config.ensure_executables_exist()
 
-        if config.verbose_output:
-            enable_verbose_logging()
-
-        is_root = getuid() == 0
+        # The effective user id is what matters for file permissions, e.g. when running through sudo
+        is_root = geteuid() == 0
 
         if require_root and not is_root:
             raise PermissionError(f"Running '{application_name}' requires root privileges. Please run as root.")
@@ -1,20 +1,23 @@
 import sys
+from functools import cache
 from os.path import abspath, dirname
 
 from alpaca.common.logging import logger
 
 
+@cache
 def get_alpaca_tool_command(name: str) -> str:
     """
     Get the command for a specific Alpaca tool. The tool path that is returned
-    is based on how the current script is executed.
+    is based on how the current script is executed. Since that can't change while
+    running, the command is only built once per tool.
     """
 
     command: str = ""
 
     if sys.argv[0].endswith(".py"):
         full_module_path = dirname(abspath(sys.argv[0]))
-        logger.debug(f"Running in Dev mode. Using script path: {full_module_path}")
+        logger.debug("Running in Dev mode. Using script path: %s", full_module_path)
         command += f"PYTHONPATH={full_module_path} "
 
     command += f'''python3 -c "from alpaca.{name}.main import main; main()" '''
@@ -0,0 +1,18 @@
+_development_version = "0.0.0.dev"
+
+
+def get_alpaca_version() -> str:
+    """
+    Get the version of alpaca. The version is written to alpaca/_version.py by setuptools_scm when the package is
+    built, which avoids scanning the installed distributions through importlib.metadata.
+
+    Returns:
+        str: The version of alpaca, or a development version when running from a source checkout that was never built
+    """
+
+    try:
+        from alpaca._version import __version__
+    except ImportError:
+        return _development_version
+
+    return __version__
@@ -1,20 +1,26 @@
 import hashlib
+import urllib.error
 import urllib.request
 from os import makedirs
-from os.path import basename, join, getsize, exists
+from os.path import basename, join, exists
 from pathlib import Path
 from shutil import copy
 from urllib.parse import urlparse
 
+from alpaca.common.hash import copy_file_with_hash, write_stream_with_hash
 from alpaca.common.logging import logger
 from alpaca.common.progress_bar import show_progress_bar
 from alpaca.configuration.configuration import Configuration
 
 
 def _check_download_cache_path(configuration: Configuration):
-    if not exists(configuration.download_cache_path):
-        logger.info(f"Creating download cache path {configuration.download_cache_path}...")
+    # Sources are downloaded concurrently, so another download may create the path at the same time
+    try:
         makedirs(configuration.download_cache_path)
+    except FileExistsError:
+        return
+
+    logger.info(f"Created download cache path {configuration.download_cache_path}")
 
 
 def _get_hash_from_string(string: str) -> str:
@@ -23,9 +29,11 @@ def _get_hash_from_string(string: str) -> str:
     return hash_object.hexdigest()
 
 
-def download_file(configuration: Configuration, url: str, destination_dir: Path, show_progress: bool = True):
+def download_file(configuration: Configuration, url: str, destination_dir: Path,
+                  show_progress: bool = True) -> tuple[str, str]:
     """
-    Download a file from a URL to a destination directory
+    Download a file from a URL to a destination directory. The sha256 hash of the file is calculated while it is
+    downloaded or copied from the download cache, so the file doesn't need to be read again to verify it.
 
     Args:
         configuration (Configuration): The effective application configuration
@@ -34,7 +42,7 @@ def download_file(configuration: Configuration, url: str, destination_dir: Path,
         show_progress (bool, optional): Whether to show a progress bar while downloading. Defaults to True.
 
     Returns:
-        str: The name of the downloaded file
+        tuple[str, str]: The full path to the downloaded file and its sha256 hash
     """
 
     _check_download_cache_path(configuration)
@@ -50,28 +58,38 @@ def download_file(configuration: Configuration, url: str, destination_dir: Path,
         file_name = basename(parsed_url.path)
         destination_base_path = join(configuration.download_cache_path, url_hash)
 
-        if not exists(destination_base_path):
-            makedirs(destination_base_path)
+        makedirs(destination_base_path, exist_ok=True)
 
         destination_path = join(destination_base_path, file_name)
 
-        urllib.request.urlretrieve(url, destination_path, reporthook=lambda block_num, block_size, total_size: (
-            show_progress_bar(block_num * block_size, total_size) if show_progress else None))
+        with urllib.request.urlopen(url) as response, open(destination_path, "wb") as file:
+            total_size = int(response.headers.get("Content-Length") or 0)
+            report_progress = show_progress and total_size > 0
+
+            file_hash = write_stream_with_hash(
+                response, file,
+                progress_callback=(lambda size: show_progress_bar(size, total_size)) if report_progress else None)
 
-        # Hack; the reporthook doesn't report the final block, so we need to print the final progress
-        if show_progress:
-            show_progress_bar(getsize(destination_path), getsize(destination_path))
+            # Reading the response doesn't fail when the connection is closed early. Like urlretrieve, an incomplete
+            # download raises, before the file is copied or marked as complete in the download cache.
+            if file.tell() < total_size:
+                raise urllib.error.ContentTooShortError(
+                    f"Download of {url} incomplete: got only {file.tell()} out of {total_size} bytes",
+                    (destination_path, response.headers))
 
-        copy(destination_path, destination_dir)
+        destination_file_path = join(destination_dir, file_name)
+        copy(destination_path, destination_file_path)
 
         with open(filename_info_path, 'w') as file:
             file.writelines(file_name)
 
-        return
+        return destination_file_path, file_hash
 
     with open(filename_info_path, 'r') as file:
         filename = file.readline()
 
     logger.info(f"Url {url} found in download cache.")
-    copy(join(configuration.download_cache_path, url_hash, filename), join(destination_dir, filename))
-    return
+
+    destination_file_path = join(destination_dir, filename)
+    file_hash = copy_file_with_hash(join(configuration.download_cache_path, url_hash, filename), destination_file_path)
+    return destination_file_path, file_hash
@@ -1,8 +1,13 @@
 import hashlib
+import hmac
 import os
+from shutil import copymode
+from typing import BinaryIO, Callable
 
 from alpaca.common.logging import logger
 
+_copy_chunk_size = 1 << 20
+
 
 def get_file_hash(path: str) -> str:
     """
@@ -15,7 +20,7 @@ def get_file_hash(path: str) -> str:
         str: The sha256 hash of the file
     """
     with open(path, "rb") as file:
-        return hashlib.sha256(file.read()).hexdigest()
+        return hashlib.file_digest(file, "sha256").hexdigest()
 
 
 def write_file_hash(path: str):
@@ -30,6 +35,72 @@ def write_file_hash(path: str):
         file.write(get_file_hash(path))
 
 
+def write_stream_with_hash(source: BinaryIO, destination: BinaryIO,
+                           progress_callback: Callable[[int], None] | None = None) -> str:
+    """
+    Copy a stream to another stream, calculating the sha256 hash of the data while it is copied. This avoids
+    reading the written file again just to verify its hash.
+
+    Args:
+        source (BinaryIO): The stream to read from
+        destination (BinaryIO): The stream to write to
+        progress_callback (Callable[[int], None], optional): Called with the number of bytes copied so far
+
+    Returns:
+        str: The sha256 hash of the copied data
+    """
+    hash_object = hashlib.sha256()
+    bytes_copied = 0
+
+    while chunk := source.read(_copy_chunk_size):
+        hash_object.update(chunk)
+        destination.write(chunk)
+
+        if progress_callback is not None:
+            bytes_copied += len(chunk)
+            progress_callback(bytes_copied)
+
+    return hash_object.hexdigest()
+
+
+def copy_file_with_hash(source_path: str, destination_path: str) -> str:
+    """
+    Copy a file, including its permissions, and calculate its sha256 hash while it is copied
+
+    Args:
+        source_path (str): The path of the file to copy
+        destination_path (str): The path to copy the file to
+
+    Returns:
+        str: The sha256 hash of the file
+    """
+    with open(source_path, "rb") as source, open(destination_path, "wb") as destination:
+        file_hash = write_stream_with_hash(source, destination)
+
+    copymode(source_path, destination_path)
+    return file_hash
+
+
+def check_hash_from_string(name: str, file_hash: str, expected_hash: str) -> bool:
+    """
+    Check if an already calculated hash matches the expected hash
+
+    Args:
+        name (str): The name of the hashed file, used in the error message
+        file_hash (str): The calculated hash
+        expected_hash (str): The expected hash
+
+    Returns:
+        bool: True if the hashes match, False otherwise
+    """
+    # Hashes in recipes may be written in upper case. compare_digest only accepts ASCII strings, so bytes are compared.
+    if not hmac.compare_digest(file_hash.encode("utf-8"), expected_hash.lower().encode("utf-8")):
+        logger.error(f"File {name} has hash {file_hash}, expected {expected_hash}. File may be corrupt.")
+        return False
+
+    return True
+
+
 def check_file_hash_from_string(path: str, expected_hash: str) -> bool:
     """
     Check if a file exists and has the correct hash
@@ -45,13 +116,7 @@ def check_file_hash_from_string(path: str, expected_hash: str) -> bool:
         logger.error(f"File {path} does not exist. Could not verify sha256 hash.")
         return False
 
-    file_hash = get_file_hash(path)
-
-    if file_hash != expected_hash:
-        logger.error(f"File {path} has hash {file_hash}, expected {expected_hash}. File may be corrupt.")
-        return False
-
-    return True
+    return check_hash_from_string(path, get_file_hash(path), expected_hash)
 
 
 def check_file_hash_from_file(path: str) -> bool:
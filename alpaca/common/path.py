@@ -0,0 +1,24 @@
+from functools import lru_cache
+from os import getcwd
+from pathlib import Path
+
+
+@lru_cache(maxsize=256)
+def _get_full_path(path: str, working_directory: str) -> str:
+    return str(Path(working_directory, Path(path).expanduser()).resolve())
+
+
+def get_full_path(path: str) -> str:
+    """
+    Get the full path for a path that may be relative or contain a user directory (e.g. ~/aleya).
+    The result is cached, since expanding and resolving a path requires several lookups and system calls.
+
+    Args:
+        path (str): The path to resolve
+
+    Returns:
+        str: The full path, with the user directory expanded and all symlinks resolved
+    """
+
+    # Relative paths depend on the working directory, so it is part of the cache key
+    return _get_full_path(path, getcwd())
@@ -1,19 +1,19 @@
-from os import makedirs
-from os.path import exists, join
+from concurrent.futures import ThreadPoolExecutor
+from os import makedirs, scandir
+from os.path import exists, isdir, isfile, join
 from pathlib import Path
 from shutil import rmtree
 
 from alpaca.common.logging import logger
 from alpaca.common.shell_command import ShellCommand
 from alpaca.configuration.configuration import Configuration
-from alpaca.configuration.repository_ref import RepositoryType
+from alpaca.configuration.repository_ref import RepositoryRef, RepositoryType
 from alpaca.recipes.recipe_version import RecipeVersion
 
+# Exit code used to tell local changes in a cached repository apart from a failing git pull
+_git_local_changes_error_code = 100
 
-class _PackageCandidate:
-    def __init__(self, version: RecipeVersion, path: Path):
-        self.version: RecipeVersion = version
-        self.path: Path = path
+_max_parallel_repository_updates = 8
 
 
 class RepositoryCache:
@@ -28,28 +28,37 @@ class RepositoryCache:
 
         self._ensure_repository_cache_path_exists()
 
+        git_repo_refs: list[RepositoryRef] = []
+
         for repo_ref in self.configuration.repositories:
             if repo_ref.get_type() == RepositoryType.GIT:
-                self._update_git_cache(repo_ref)
+                git_repo_refs.append(repo_ref)
             elif repo_ref.get_type() == RepositoryType.LOCAL:
-                logger.debug(f"Skipping local repository cache update for {repo_ref}")
+                logger.debug("Skipping local repository cache update for %s", repo_ref)
             else:
                 raise ValueError(f"Unsupported repository type: {repo_ref.get_type()}")
 
+        self._update_git_caches(git_repo_refs)
+
     def reset_cache(self):
         """
         Reset the repository cache by removing all cached repositories and redownloading them.
         """
 
+        git_repo_refs: list[RepositoryRef] = []
+
         for repo_ref in self.configuration.repositories:
             if repo_ref.get_type() != RepositoryType.GIT:
                 continue
 
-            repository_path = repo_ref.get_cache_path(self.configuration.repository_cache_path)
-            if exists(repository_path):
-                rmtree(repository_path)
+            try:
+                rmtree(repo_ref.get_cache_path(self.configuration.repository_cache_path))
+            except FileNotFoundError:
+                pass
+
+            git_repo_refs.append(repo_ref)
 
-            self._update_git_cache(repo_ref)
+        self._update_git_caches(git_repo_refs)
 
     def find_recipe(self, path: str) -> Path | None:
         """
@@ -59,16 +68,15 @@ class RepositoryCache:
         Args:
             path (str): The path or name of the package to find.
         """
-        if not exists(self.configuration.repository_cache_path):
-            raise ValueError(
-                f"Repository cache path '{self.configuration.repository_cache_path}' does not exist. "
-                "Please run 'apupdate' to create the cache."
-            )
-
         if path == "":
             logger.error("No package name given.")
             return None
 
+        # A recipe file can be built without a repository cache
+        if path.endswith(self.configuration.recipe_file_extension) and isfile(path):
+            logger.debug("Given package detected as recipe file.")
+            return Path(path)
+
         if exists(path):
             logger.debug("Given package detected as absolute path.")
             return Path(path)
@@ -89,49 +97,77 @@ class RepositoryCache:
         if len(parts) == 2:
             requested_version = parts[1]
  
-        candidates : list[_PackageCandidate] = []
+        candidates: dict[RecipeVersion, Path] = {}
 
         if len(self.configuration.repositories) == 0:
             raise Exception("No repositories configured. Please add repositories to the configuration.")
 
-        for repo_ref in self.configuration.repositories:
-            repo_path = repo_ref.get_cache_path(self.configuration.repository_cache_path)
+        configuration = self.configuration
+        repository_cache_path = configuration.repository_cache_path
+        recipe_file_extension = configuration.recipe_file_extension
+        recipe_file_prefix = f"{name}-"
+        version_start = len(recipe_file_prefix)
+        version_end = -len(recipe_file_extension)
 
-            logger.verbose(f"Repository {repo_ref.get_path()}")
+        for repo_ref in configuration.repositories:
+            repo_path = repo_ref.get_cache_path(repository_cache_path)
 
-            for stream in self.configuration.package_streams:
-                logger.verbose(f" - Searching '{stream}'...")
+            logger.verbose("Repository %s", repo_ref.get_path())
 
-                package_path_base = join(repo_path, stream, name)
+            for stream in configuration.package_streams:
+                logger.verbose(" - Searching '%s'...", stream)
 
-                if not exists(package_path_base):
+                try:
+                    recipe_entries = scandir(join(repo_path, stream, name))
+                except (FileNotFoundError, NotADirectoryError):
                     continue
 
-                logger.verbose(f"Searching for recipes in {package_path_base}")
+                # scandir entries cache the file type reported by the directory listing, which saves a stat per entry
+                with recipe_entries:
+                    for recipe_entry in recipe_entries:
+                        file_name = recipe_entry.name
+
+                        # Check the name first; is_file() may still need a stat for symlinks
+                        if not file_name.endswith(recipe_file_extension) or \
+                                not file_name.startswith(recipe_file_prefix):
+                            logger.verbose("Skipping non-recipe file: %s", file_name)
+                            continue
+
+                        if not recipe_entry.is_file():
+                            logger.verbose("Skipping non-file: %s", file_name)
+                            continue
 
-                for recipe_file_path in Path(package_path_base).iterdir():
-                    if not recipe_file_path.is_file():
-                        logger.verbose(f"Skipping non-file: {recipe_file_path.name}")
-                        continue
+                        # A single slice strips both the name prefix and the extension
+                        version_string = file_name[version_start:version_end]
 
-                    if not recipe_file_path.name.endswith(self.configuration.recipe_file_extension):
-                        logger.verbose(f"Skipping non-recipe file: {recipe_file_path.name}")
-                        continue
+                        if version_string == "":
+                            logger.warning(f"Found recipe {recipe_entry.path} without version information. "
+                                           "Skipping.")
+                            continue
 
-                    version = recipe_file_path.name[len(name)+1:][:-len(self.configuration.recipe_file_extension)]
+                        version = RecipeVersion.from_string(version_string)
 
-                    if version == "":
-                        logger.warning(f"Found recipe {recipe_file_path} without version information. Skipping.")
-                        continue
+                        # The first repository and stream in the configuration wins
+                        if version in candidates:
+                            logger.verbose("Ignoring recipe %s; version '%s' of package '%s' was already found in %s",
+                                           recipe_entry.path, version, name, candidates[version])
+                            continue
 
-                    candidates.append(_PackageCandidate(RecipeVersion.from_string(version), recipe_file_path))
+                        candidates[version] = Path(recipe_entry.path)
 
         if not candidates:
+            # Only look at the cache path when nothing was found, to give a more helpful error
+            if not isdir(self.configuration.repository_cache_path):
+                raise ValueError(
+                    f"Repository cache path '{self.configuration.repository_cache_path}' does not exist. "
+                    "Please run 'apupdate' to create the cache."
+                )
+
             logger.error(f"No recipes found for package '{name}' in the repository cache.")
             return None
 
         version = RecipeVersion.find_closest_version_or_none(
-            versions=[c.version for c in candidates],
+            versions=list(candidates),
             requested_version=requested_version
         )
 
@@ -139,18 +175,35 @@ class RepositoryCache:
             logger.error(f"No matching version found for package '{name}' with requested version '{requested_version}'.")
             return None
 
-        for candidate in candidates:
-            if candidate.version == version:
-                logger.debug(f"Found recipe {candidate.path} for package '{name}' with version '{version}'")
-                return candidate.path
+        logger.debug("Found recipe %s for package '%s' with version '%s'", candidates[version], name, version)
+        return candidates[version]
 
-        return None
+    def _ensure_repository_cache_path_exists(self):
+        try:
+            makedirs(self.configuration.repository_cache_path)
+        except FileExistsError:
+            return
 
+        logger.info(f"Created repository cache directory: {self.configuration.repository_cache_path}")
 
-    def _ensure_repository_cache_path_exists(self):
-        if not exists(self.configuration.repository_cache_path):
-            logger.info(f"Creating repository cache directory: {self.configuration.repository_cache_path}")
-            makedirs(self.configuration.repository_cache_path, exist_ok=True)
+    def _update_git_caches(self, repo_refs: list[RepositoryRef]):
+        """
+        Update the cache for multiple git repositories. The repositories are independent and updating them is mostly
+        spent waiting on the network, so they are updated concurrently.
+
+        Args:
+            repo_refs (list[RepositoryRef]): The git repositories to update
+        """
+
+        if not repo_refs:
+            return
+
+        with ThreadPoolExecutor(max_workers=min(_max_parallel_repository_updates, len(repo_refs))) as executor:
+            futures = [executor.submit(self._update_git_cache, repo_ref) for repo_ref in repo_refs]
+
+        # Raise the first failure in the order of the configuration
+        for future in futures:
+            future.result()
 
     def _update_git_cache(self, repo_ref):
         """
@@ -159,7 +212,7 @@ class RepositoryCache:
         """
         repository_path = repo_ref.get_cache_path(self.configuration.repository_cache_path)
 
-        logger.debug(f"Updating git repository cache for {repo_ref} on {repository_path}")
+        logger.debug("Updating git repository cache for %s on %s", repo_ref, repository_path)
 
         if not exists(repository_path):
             if (
@@ -169,9 +222,13 @@ class RepositoryCache:
                 logger.error(f"Failed to clone repository {repository_path}")
                 raise ValueError(f"Failed to clone repository {repository_path}")
         else:
-            if ShellCommand.exec(
-                    configuration=self.configuration,
-                    command=f"git -C {repository_path} diff --quiet").error_code != 0:
+            # Check for local changes and pull in a single shell, instead of spawning one for each git command
+            error_code = ShellCommand.exec(
+                configuration=self.configuration,
+                command=f"git -C {repository_path} diff --quiet || exit {_git_local_changes_error_code}\n"
+                        f"git -C {repository_path} pull --ff-only").error_code
+
+            if error_code == _git_local_changes_error_code:
                 logger.error(
                     f"Local changes detected in repository {repository_path}. "
                     "Local changes in the cache are currently not supported. "
@@ -179,8 +236,6 @@ class RepositoryCache:
                 )
                 raise ValueError(f"Local changes detected in repository {repository_path}")
 
-            if ShellCommand.exec(
-                configuration=self.configuration,
-                command=f"git -C {repository_path} pull --ff-only").error_code != 0:
+            if error_code != 0:
                 logger.error(f"Failed to update repository {repository_path}")
                 raise ValueError(f"Failed to update repository {repository_path}")
@@ -1,8 +1,10 @@
+import codecs
 import io
+import locale
 import subprocess
 import sys
 import threading
-from os import environ
+from os import environ, read
 from pathlib import Path
 
 from alpaca.common.logging import logger
@@ -11,6 +13,11 @@ from alpaca.configuration.configuration import Configuration
 _bash_executable = "/usr/bin/bash"
 _fakeroot_executable = "/usr/bin/fakeroot"
 
+_read_chunk_size = 1 << 17
+
+# The encoding that subprocess uses for text mode pipes
+_output_encoding = locale.getpreferredencoding(False)
+
 
 class ShellCommandResult:
     def __init__(self, error_code: int, stdout: str, stderr: str):
@@ -22,10 +29,22 @@ class ShellCommandResult:
 class ShellCommand:
     @staticmethod
     def _stream_output(stream, print_output: bool, output_string: io.StringIO, destination, ):
-        for line in iter(stream.readline, ""):
-            if print_output:
-                print(line, end="", file=destination)
-            output_string.write(line)
+        # Reading large chunks straight from the pipe needs far fewer calls than reading line by line for commands
+        # with a lot of output, like compilers. The decoder handles characters and line endings split across chunks.
+        decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(_output_encoding)(), translate=True)
+        file_descriptor = stream.fileno()
+
+        while True:
+            chunk = read(file_descriptor, _read_chunk_size)
+            text = decoder.decode(chunk, final=not chunk)
+
+            if text:
+                if print_output:
+                    print(text, end="", file=destination)
+                output_string.write(text)
+
+            if not chunk:
+                break
 
         stream.close()
 
@@ -63,8 +82,8 @@ class ShellCommand:
         args.append("-c")
         args.append(command)
 
-        process = subprocess.Popen(args=args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1,
-                                   universal_newlines=True, cwd=working_directory, env=env)
+        process = subprocess.Popen(args=args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0,
+                                   cwd=working_directory, env=env)
 
         stdout_str = io.StringIO()
         stderr_str = io.StringIO()
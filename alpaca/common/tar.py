@@ -1,46 +1,191 @@
-import tarfile
-from os import walk
-from os.path import join, relpath
+import subprocess
+from os import access, X_OK
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 from alpaca.common.logging import logger
+from alpaca.configuration.configuration import Configuration
 
+# tarfile is slow to import and pulls in several other modules, so it is only imported by the functions that need it
+if TYPE_CHECKING:
+    from tarfile import TarFile
 
-def extract_tar(file_path: Path, destination_dir: Path):
+_xz_magic = b"\xfd7zXZ\x00"
+_zstd_magic = b"\x28\xb5\x2f\xfd"
+
+# The magic of ustar and GNU tar headers, at this offset in the first 512 byte block of the archive
+_tar_header_size = 512
+_tar_magic = b"ustar"
+_tar_magic_offset = 257
+
+# tarfile reads streams in 10 KiB records and copies members in 16 KiB blocks by default. Larger buffers need far
+# fewer read and write calls for large source archives.
+_buffer_size = 1 << 20
+
+
+def _is_executable(path: str | None) -> bool:
+    return bool(path) and access(path, X_OK)
+
+
+def _read_magic(file_path: Path) -> bytes:
+    with open(file_path, "rb") as file:
+        return file.read(len(_xz_magic))
+
+
+def _extract_all(tar: "TarFile", destination_dir: Path):
+    import tarfile
+
+    # Source archives may contain absolute symlinks, e.g. config.guess -> /usr/share/misc/config.guess, which the
+    # data filter rejects. The tar filter keeps them, like extracting without a filter did, and is given explicitly
+    # because newer Python versions default to the data filter.
+    if hasattr(tarfile, "tar_filter"):
+        tar.extractall(destination_dir, filter="tar")
+    else:
+        tar.extractall(destination_dir)
+
+
+def _is_zstd_tar_archive(configuration: Configuration, file_path: Path) -> bool:
+    if not _is_executable(configuration.zstd_executable):
+        logger.warning(f"Not extracting {file_path}: zstd compressed files require {configuration.zstd_executable}.")
+        return False
+
+    # Only the first header is decompressed. Closing the pipe afterwards stops zstd.
+    process = subprocess.Popen([configuration.zstd_executable, "-d", "-c", str(file_path)], stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL)
+
+    try:
+        header = process.stdout.read(_tar_header_size)
+    finally:
+        process.stdout.close()
+        process.wait()
+
+    return header[_tar_magic_offset:_tar_magic_offset + len(_tar_magic)] == _tar_magic
+
+
+def is_tar_archive(configuration: Configuration, file_path: Path) -> bool:
+    """
+    Check if a file is a tar archive that can be extracted with extract_tar
+
+    Args:
+        configuration (Configuration): The effective application configuration
+        file_path (Path): The path of the file to check
+
+    Returns:
+        bool: True if the file is a (compressed) tar archive, False otherwise
+    """
+
+    import tarfile
+
+    # The tarfile module can't read zstd compressed archives by itself. Other files, e.g. patches, are compressed
+    # with zstd as well, so the decompressed header is checked.
+    if _read_magic(file_path).startswith(_zstd_magic):
+        return _is_zstd_tar_archive(configuration, file_path)
+
+    return tarfile.is_tarfile(file_path)
+
+
+def extract_tar(configuration: Configuration, file_path: Path, destination_dir: Path):
     """
     Untar a file to a destination directory
 
+    Archives compressed with zstd, and xz when available, are decompressed by their executables in a separate
+    process, which runs in parallel with the extraction and can use multiple cores for xz.
+
     Args:
+        configuration (Configuration): The effective application configuration
         file_path (Path): The path of the tar file to extract
         destination_dir (Path): The directory to extract the tar file to
     """
 
-    logger.verbose(f"Extracting {file_path} to {destination_dir}...")
+    import tarfile
 
-    with tarfile.open(file_path, "r") as tar:
-        tar.extractall(destination_dir)
+    logger.verbose("Extracting %s to %s...", file_path, destination_dir)
+
+    magic = _read_magic(file_path)
+    decompress_command: list[str] | None = None
+
+    if magic.startswith(_zstd_magic):
+        if not _is_executable(configuration.zstd_executable):
+            raise FileNotFoundError(f"Extracting {file_path} requires {configuration.zstd_executable}.")
+
+        decompress_command = [configuration.zstd_executable, "-d", "-c", str(file_path)]
+    elif magic.startswith(_xz_magic) and _is_executable(configuration.xz_executable):
+        decompress_command = [configuration.xz_executable, "-T0", "-d", "-c", str(file_path)]
+
+    if decompress_command is None:
+        # Streaming mode reads the archive front to back without seeking back in the decompressed stream
+        with tarfile.open(file_path, "r|*", bufsize=_buffer_size, copybufsize=_buffer_size) as tar:
+            _extract_all(tar, destination_dir)
+    else:
+        process = subprocess.Popen(decompress_command, stdout=subprocess.PIPE)
+
+        try:
+            with tarfile.open(fileobj=process.stdout, mode="r|", bufsize=_buffer_size,
+                              copybufsize=_buffer_size) as tar:
+                _extract_all(tar, destination_dir)
+        finally:
+            process.stdout.close()
+            error_code = process.wait()
 
-    logger.verbose(f"File {file_path} extracted to {destination_dir}")
+        if error_code != 0:
+            raise Exception(f"Decompressing {file_path} failed with error code {error_code}.")
 
+    logger.verbose("File %s extracted to %s", file_path, destination_dir)
 
-def compress_tar(directory: Path, archive_path: Path):
+
+def _add_directory_to_tar(tar: "TarFile", directory: Path):
+    from os import walk
+    from os.path import join, relpath
+
+    # Entries are sorted per directory, which makes the archive reproducible while still adding files as they are found
+    for root, dirnames, filenames in walk(directory):
+        dirnames.sort()
+
+        for filename in sorted(filenames):
+            file = join(root, filename)
+            tar.add(file, arcname=relpath(file, directory), recursive=False)
+
+
+def compress_tar(configuration: Configuration, directory: Path, archive_path: Path):
     """
     Compress a directory to a tar.xz archive
 
+    The archive is compressed by the xz executable using all available cores. If xz is not available,
+    the single threaded compression of the tarfile module is used instead.
+
+    Packages are not archived with this function. The owners and permissions set by the package script only exist
+    inside its fakeroot session, so the tar executable archives the package directory within that same session.
+
     Args:
+        configuration (Configuration): The effective application configuration
         directory (Path): The source directory to archive
         archive_path (Path): The path of the target archive
     """
 
-    logger.verbose(f"Archiving directory {directory} to {archive_path}...")
+    import tarfile
+
+    logger.verbose("Archiving directory %s to %s...", directory, archive_path)
+
+    xz_executable = configuration.xz_executable
+
+    if not _is_executable(xz_executable):
+        logger.debug("Executable %s not available. Using single threaded compression.", xz_executable)
+
+        with tarfile.open(archive_path, "w:xz", copybufsize=_buffer_size) as tar:
+            _add_directory_to_tar(tar, directory)
+    else:
+        with open(archive_path, "wb") as archive_file:
+            process = subprocess.Popen([xz_executable, "-T0", "-c"], stdin=subprocess.PIPE, stdout=archive_file)
 
-    files = []
-    for root, _, filenames in walk(directory):
-        for filename in filenames:
-            files.append(join(root, filename))
+            try:
+                with tarfile.open(fileobj=process.stdin, mode="w|", bufsize=_buffer_size,
+                                  copybufsize=_buffer_size) as tar:
+                    _add_directory_to_tar(tar, directory)
+            finally:
+                process.stdin.close()
+                error_code = process.wait()
 
-    with tarfile.open(archive_path, "w:xz") as tar:
-        for file in files:
-            tar.add(file, arcname=relpath(file, directory))
+        if error_code != 0:
+            raise Exception(f"Compressing {archive_path} failed with error code {error_code}.")
 
-    logger.verbose(f"Directory {directory} archived to {archive_path}")
+    logger.verbose("Directory %s archived to %s", directory, archive_path)
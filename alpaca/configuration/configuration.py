@@ -1,34 +1,114 @@
 from argparse import Namespace
-from configparser import ConfigParser
 from os import environ, getcwd, access, X_OK
 from os.path import exists, abspath, expandvars, expanduser, join
-from pathlib import Path
 from typing import Self
 
 from alpaca.common.logging import logger
+from alpaca.common.path import get_full_path
 from alpaca.configuration.repository_ref import RepositoryRef
 
 _system_config_path = "/etc/alpaca.conf"
 _user_config_path = abspath(expandvars(expanduser("~/.alpaca")))
 _alpaca_config_env_var = "ALPACA_CONFIG"
 
+# The same values that ConfigParser.getboolean accepts, so existing configuration files keep working
+_boolean_values = {"1": True, "yes": True, "true": True, "on": True,
+                   "0": False, "no": False, "false": False, "off": False}
+
 _default_fakeroot_executable = "/usr/bin/fakeroot"
 _default_shell_executable = "/usr/bin/bash"
 _default_tar_executable = "/usr/bin/tar"
 _default_cat_executable = "/usr/bin/cat"
+_default_xz_executable = "/usr/bin/xz"
+_default_zstd_executable = "/usr/bin/zstd"
+_default_pigz_executable = "/usr/bin/pigz"
 
 
 _default_recipe_file_extension = ".recipe.sh"
 _default_package_file_extension = ".alpaca-package.tgz"
 
 
+def _parse_config_file(path: str) -> dict[str, dict[str, str]]:
+    """
+    Parse an ini style configuration file into the values of each section.
+
+    Only sections, comments and "key=value" or "key: value" lines are supported, which covers everything used in
+    alpaca configuration files. This is a lot cheaper than ConfigParser and its interpolation machinery.
+
+    Args:
+        path (str): The path of the configuration file
+
+    Raises:
+        ValueError: If the file contains an invalid line, or a section or key that is defined more than once
+
+    Returns:
+        dict[str, dict[str, str]]: The values of each section in the configuration file
+    """
+
+    values: dict[str, dict[str, str]] = {}
+    section: dict[str, str] | None = None
+
+    with open(path, "r", encoding="utf-8") as file:
+        for line_number, line in enumerate(file, start=1):
+            line = line.strip()
+
+            if not line or line[0] in "#;":
+                continue
+
+            if line[0] == "[" and line[-1] == "]":
+                section_name = line[1:-1].strip()
+
+                # Like ConfigParser, a section or key may only be defined once
+                if section_name in values:
+                    raise ValueError(f"Duplicate section '{section_name}' in {path}, line {line_number}")
+
+                section = values[section_name] = {}
+                continue
+
+            if section is None:
+                raise ValueError(f"Value outside of a section in {path}, line {line_number}: {line}")
+
+            delimiters = [index for index in (line.find("="), line.find(":")) if index != -1]
+
+            if not delimiters:
+                raise ValueError(f"Invalid line in {path}, line {line_number}: {line}")
+
+            delimiter = min(delimiters)
+
+            # Like ConfigParser, keys are case-insensitive
+            key = line[:delimiter].strip().lower()
+
+            if key in section:
+                raise ValueError(f"Duplicate key '{key}' in {path}, line {line_number}")
+
+            section[key] = line[delimiter + 1:].strip()
+
+    return values
+
+
+def _get_config_value(values: dict[str, dict[str, str]], section: str, key: str) -> str | None:
+    return values.get(section, {}).get(key)
+
+
+def _get_config_boolean(values: dict[str, dict[str, str]], section: str, key: str) -> bool | None:
+    value = _get_config_value(values, section, key)
+
+    if value is None:
+        return None
+
+    if value.lower() not in _boolean_values:
+        raise ValueError(f"Not a boolean: {value}")
+
+    return _boolean_values[value.lower()]
+
+
 class Configuration:
     """
     Configuration class for managing build settings and options.
     """
 
     def __init__(self, **kwargs) -> None:
-        self.verbose_output: bool | None = kwargs.get('verbose', None)
+        self.verbose_output: bool | None = kwargs.get('verbose_output', None)
         self.suppress_build_output: bool | None = kwargs.get('suppress_build_output', None)
         self.show_download_progress: bool | None = kwargs.get('show_download_progress', None)
 
@@ -58,6 +138,9 @@ class Configuration:
         self.shell_executable: str | None = kwargs.get('shell_executable', None)
         self.tar_executable: str | None = kwargs.get('tar_executable', None)
         self.cat_executable: str | None = kwargs.get('cat_executable', None)
+        self.xz_executable: str | None = kwargs.get('xz_executable', None)
+        self.zstd_executable: str | None = kwargs.get('zstd_executable', None)
+        self.pigz_executable: str | None = kwargs.get('pigz_executable', None)
 
         self.recipe_file_extension: str | None = kwargs.get('recipe_file_extension', None)
         self.package_file_extension: str | None = kwargs.get('package_file_extension', None)
@@ -88,17 +171,12 @@ class Configuration:
 
         config_env_var = environ.get(_alpaca_config_env_var, None)
         if config_env_var is not None:
-            logger.debug(f"Using configuration file specified in {_alpaca_config_env_var} environment variable")
+            logger.debug("Using configuration file specified in %s environment variable", _alpaca_config_env_var)
 
-            aleya_config_env_path = config_env_var
-            if exists(aleya_config_env_path):
-                system_config = Configuration._create_from_config_file(aleya_config_env_path)
-            else:
-                logger.warning(f"Configuration file specified in {_alpaca_config_env_var} environment "
-                               f" variable does not exist: {aleya_config_env_path}.")
+            # Falls back to the system configuration below if the file does not exist
+            system_config = Configuration._create_from_config_file(config_env_var)
 
         if system_config is None:
-            logger.debug(f"Loading system config file: {_system_config_path}")
             system_config = Configuration._create_from_config_file(_system_config_path)
 
         user_config = Configuration._create_from_config_file(_user_config_path)
@@ -122,10 +200,10 @@ class Configuration:
                 setattr(normalized_config, key, "")
 
         # Normalize paths since they may contain environment variables or user directories
-        normalized_config.download_cache_path = str(Path(self.download_cache_path).expanduser().resolve())
-        normalized_config.package_workspace_path = str(Path(self.package_workspace_path).expanduser().resolve())
-        normalized_config.package_artifact_path = str(Path(self.package_artifact_path).expanduser().resolve())
-        normalized_config.repository_cache_path = str(Path(self.repository_cache_path).expanduser().resolve())
+        normalized_config.download_cache_path = get_full_path(self.download_cache_path)
+        normalized_config.package_workspace_path = get_full_path(self.package_workspace_path)
+        normalized_config.package_artifact_path = get_full_path(self.package_artifact_path)
+        normalized_config.repository_cache_path = get_full_path(self.repository_cache_path)
 
         return normalized_config
 
@@ -162,34 +240,36 @@ class Configuration:
         """
         Load configuration from a file.
         This method should be implemented to read from a specific configuration file.
+
+        Returns:
+            Configuration | None: The configuration from the file, or None if the file does not exist.
         """
 
-        logger.debug(f"Loading config file: {path}")
+        logger.debug("Loading config file: %s", path)
 
-        if not exists(path):
+        try:
+            values = _parse_config_file(path)
+        except FileNotFoundError:
             logger.warning(f"Configuration file does not exist: {path}")
-            return Configuration()
-
-        config = ConfigParser()
-        config.read(path, encoding="utf-8")
+            return None
 
-        streams = config.get("repository", "package_streams", fallback="").split(",")
+        streams = (_get_config_value(values, "repository", "package_streams") or "").split(",")
 
         if not streams or streams == [""]:
             streams = None
 
         return Configuration(
-            suppress_build_output=config.getboolean("general", "suppress_build_output", fallback=None),
-            show_download_progress=config.getboolean("general", "show_download_progress", fallback=None),
-            repository_cache_path=config.get("general", "repository_cache_path", fallback=None),
-            download_cache_path=config.get("general", "download_cache_path", fallback=None),
-            target_architecture=config.get("environment", "target_architecture", fallback=None),
-            c_flags=config.get("build", "c_flags", fallback=None),
-            cpp_flags=config.get("build", "cpp_flags", fallback=None),
-            ld_flags=config.get("build", "ld_flags", fallback=None),
-            make_flags=config.get("build", "make_flags", fallback=None),
-            ninja_flags=config.get("build", "ninja_flags", fallback=None),
-            repositories=RepositoryRef.from_string(config.get("repository", "repositories", fallback="")),
+            suppress_build_output=_get_config_boolean(values, "general", "suppress_build_output"),
+            show_download_progress=_get_config_boolean(values, "general", "show_download_progress"),
+            repository_cache_path=_get_config_value(values, "general", "repository_cache_path"),
+            download_cache_path=_get_config_value(values, "general", "download_cache_path"),
+            target_architecture=_get_config_value(values, "environment", "target_architecture"),
+            c_flags=_get_config_value(values, "build", "c_flags"),
+            cpp_flags=_get_config_value(values, "build", "cpp_flags"),
+            ld_flags=_get_config_value(values, "build", "ld_flags"),
+            make_flags=_get_config_value(values, "build", "make_flags"),
+            ninja_flags=_get_config_value(values, "build", "ninja_flags"),
+            repositories=RepositoryRef.from_string(_get_config_value(values, "repository", "repositories") or ""),
             package_streams=streams)
 
     @classmethod
@@ -218,6 +298,9 @@ class Configuration:
             shell_executable=_default_shell_executable,
             tar_executable=_default_tar_executable,
             cat_executable=_default_cat_executable,
+            xz_executable=_default_xz_executable,
+            zstd_executable=_default_zstd_executable,
+            pigz_executable=_default_pigz_executable,
             recipe_file_extension=_default_recipe_file_extension,
             package_file_extension=_default_package_file_extension
         )
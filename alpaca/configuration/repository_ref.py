@@ -1,9 +1,12 @@
 import hashlib
 from enum import Enum
+from functools import cached_property
 from os.path import join
 from pathlib import Path
 from typing import Self
 
+from alpaca.common.path import get_full_path
+
 
 class RepositoryType(Enum):
     """
@@ -24,14 +27,26 @@ class RepositoryRef:
         """
 
         if ref_string.startswith("git+"):
-            self._path = ref_string[4:]
+            self._ref_path = ref_string[4:]
             self._repo_type = RepositoryType.GIT
         elif ref_string.startswith("local+"):
-            self._path = str(Path(ref_string[6:]).expanduser().resolve())
+            self._ref_path = ref_string[6:]
             self._repo_type = RepositoryType.LOCAL
         else:
             raise ValueError(f"Invalid or unsupported repository type: {ref_string}")
 
+    @cached_property
+    def _path(self) -> str:
+        """
+        The path of the repository. Local paths are only resolved on first use, since repositories from one
+        configuration file are often replaced by those of another, and many commands never use them at all.
+        """
+
+        if self._repo_type == RepositoryType.LOCAL:
+            return get_full_path(self._ref_path)
+
+        return self._ref_path
+
     def get_path(self) -> str:
         """
         Get the path to the repository as defined in the repository entry
@@ -90,13 +105,10 @@ class RepositoryRef:
             list[Self] | None: A list of RepositoryRef objects or None if the string is empty.
         """
 
+        string = string.strip()
+
         if not string:
             return None
 
-        repo_list = string.split(",")
-
-        repositories: list[RepositoryRef] = []
-        for repo in repo_list:
-            repositories.append(RepositoryRef(repo))
-
-        return repositories
+        # Skip empty entries, e.g. from a trailing comma
+        return [RepositoryRef(repo) for repo in string.split(",") if repo]
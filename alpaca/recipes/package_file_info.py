@@ -1,15 +1,45 @@
-from hashlib import sha256
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import file_digest
+from os import DirEntry, cpu_count, scandir
 from pathlib import Path
+from typing import Iterator
 
 from alpaca.common.logging import logger
 
 _file_info_file_name = ".file_info"
 
-_file_ignore_list = [
+_file_ignore_list = frozenset([
     _file_info_file_name,
     ".hash",
     ".package_info"
-]
+])
+
+
+def _walk_files(path: str) -> Iterator[DirEntry]:
+    """
+    Recursively yield the directory entries of all files below the given path. Ignored names are pruned before the
+    entry type is checked, and the entries cache their stat result, so each file is only stat'ed once.
+    """
+    with scandir(path) as entries:
+        for entry in entries:
+            if entry.name in _file_ignore_list:
+                continue
+
+            if entry.is_dir(follow_symlinks=False):
+                yield from _walk_files(entry.path)
+            elif entry.is_file():
+                yield entry
+
+
+def _get_file_info_line(entry: DirEntry) -> str:
+    stat_result = entry.stat()
+    permissions = f"{stat_result.st_mode & 0o777:03o}"
+
+    # Hash in chunks instead of reading large package files into memory at once
+    with open(entry.path, "rb") as file_object:
+        sha256_hash = file_digest(file_object, "sha256").hexdigest()
+
+    return f"{permissions} {sha256_hash} {stat_result.st_size} {entry.name}\n"
 
 
 def write_file_info(path: Path | str):
@@ -29,15 +59,14 @@ def write_file_info(path: Path | str):
 
     logger.info(f"Writing file info to {path / _file_info_file_name}")
 
-    with open(path / _file_info_file_name, "w") as file_info:
-        for file in path.rglob("*"):
-            if file.is_file():
-                if file.name in _file_ignore_list:
-                    continue
+    # Sorted by path so the file info is the same regardless of the directory listing order
+    entries = sorted(_walk_files(str(path)), key=lambda entry: entry.path)
+
+    # Hashing releases the GIL, so files are hashed in parallel. map() keeps the results in the order of the entries.
+    with ThreadPoolExecutor(max_workers=cpu_count() or 1) as executor:
+        lines = list(executor.map(_get_file_info_line, entries))
 
-                permissions = oct(file.stat().st_mode)[-3:]
-                sha256_hash = sha256(file.read_bytes()).hexdigest()
-                size = file.stat().st_size
-                file_info.write(f"{permissions} {sha256_hash} {size} {file.name}\n")
+    with open(path / _file_info_file_name, "w", buffering=1 << 20) as file_info:
+        file_info.writelines(lines)
 
     logger.info(f"File info written to {path / _file_info_file_name}")
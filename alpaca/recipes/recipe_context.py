@@ -1,24 +1,53 @@
 import hashlib
-import importlib.metadata
-import shutil
-from os import makedirs
-from os.path import exists, join, isfile, basename
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property, lru_cache
+from os import access, makedirs, mkdir, stat, X_OK
+from os.path import exists, join, isfile, basename, samefile
 from pathlib import Path
 from shutil import rmtree
-from tarfile import is_tarfile
+from typing import Iterator
 from urllib.parse import urlparse
 
 from alpaca.common.alpaca_tools import get_alpaca_tool_command
+from alpaca.common.alpaca_version import get_alpaca_version
 from alpaca.common.file_downloader import download_file
-from alpaca.common.hash import check_file_hash_from_string
+from alpaca.common.hash import check_hash_from_string, copy_file_with_hash, get_file_hash
 from alpaca.common.logging import logger
 from alpaca.common.shell_command import ShellCommand
-from alpaca.common.tar import extract_tar
+from alpaca.common.tar import extract_tar, is_tar_archive
 from alpaca.configuration.configuration import Configuration
 from alpaca.recipes.recipe_description import RecipeDescription
 from alpaca.recipes.version import Version
 
-__version__ = importlib.metadata.version("aleya-alpaca")
+_max_parallel_downloads = 8
+
+_package_array_variables = ["licenses", "dependencies", "build_dependencies", "sources", "sha256sums",
+                            "package_options"]
+
+
+def _get_source_file_name(source: str) -> str:
+    parsed_source = urlparse(source)
+
+    # Downloaded files are named after the last part of the URL path, like in download_file
+    if parsed_source.scheme != "":
+        return basename(parsed_source.path)
+
+    return basename(source)
+
+
+@lru_cache(maxsize=256)
+def _compute_binary_hash(recipe_path: str, recipe_mtime_ns: int, recipe_size: int, target_architecture: str) -> str:
+    with open(recipe_path, "rb") as file:
+        hash_object = hashlib.file_digest(file, "sha256")
+
+    hash_object.update(target_architecture.encode("utf-8"))
+
+    # Left for future use if options are needed
+    # for key in sorted(self.options.keys()):
+    #    hash_object.update(key.encode("utf-8"))
+    #    hash_object.update(str(self.options[key]).encode("utf-8"))
+
+    return hash_object.hexdigest()
 
 
 class RecipeContext:
@@ -40,38 +69,31 @@ class RecipeContext:
         self.configuration = configuration
         self.recipe_path = Path(path).expanduser().resolve()
 
-        if not exists(path):
+        try:
+            self._recipe_stat = stat(self.recipe_path)
+        except FileNotFoundError:
             raise Exception(f"Recipe not found: '{path}'")
 
-        logger.debug(f"Loading package description from {path}")
+        logger.debug("Loading package description from %s", path)
 
         early_env = self._get_environment_variables(None, None, None)
-        name = self._read_package_variable(self.recipe_path, "name", env=early_env)
-        version = self._read_package_variable(self.recipe_path, "version", env=early_env)
-        release = self._read_package_variable(self.recipe_path, "release", env=early_env)
-
-        env = self._get_environment_variables(name, version, release)
-
-        url = self._read_package_variable(self.recipe_path, "url", env=env)
-
-        licenses = self._read_package_variable(self.recipe_path, "licenses", is_array=True, env=env).split()
-
-        dependencies = self._read_package_variable(self.recipe_path, "dependencies", is_array=True, env=env).split()
-
-        build_dependencies = self._read_package_variable(self.recipe_path, "build_dependencies", is_array=True,
-                                                         env=env).split()
-
-        sources = self._read_package_variable(self.recipe_path, "sources", is_array=True, env=env).split()
+        values = self._read_package_variables(early_env)
 
-        sha256sums = self._read_package_variable(self.recipe_path, "sha256sums", is_array=True, env=env).split()
+        self.description = RecipeDescription(name=values["name"], version=Version(values["version"]),
+                                             release=values["release"], url=values["url"],
+                                             licenses=tuple(values["licenses"].split()),
+                                             dependencies=tuple(values["dependencies"].split()),
+                                             build_dependencies=tuple(values["build_dependencies"].split()),
+                                             sources=tuple(values["sources"].split()),
+                                             sha256sums=tuple(values["sha256sums"].split()),
+                                             available_options=tuple(values["package_options"].split()))
 
-        available_options = self._read_package_variable(self.recipe_path, "package_options", is_array=True,
-                                                        env=env).split()
+        # The tool command only depends on how alpaca was started, so it is resolved once
+        self._apcommand = get_alpaca_tool_command("apcommand")
 
-        self.description = RecipeDescription(name=name, version=Version(version), release=release, url=url,
-                                             licenses=licenses, dependencies=dependencies,
-                                             build_dependencies=build_dependencies, sources=sources,
-                                             sha256sums=sha256sums, available_options=available_options)
+        # The environment of the recipe functions doesn't change once the description is known
+        self._env = self._get_environment_variables(self.description.name, str(self.description.version),
+                                                    self.description.release)
 
     def create_package(self):
         """
@@ -82,11 +104,15 @@ class RecipeContext:
         """
 
         try:
-            self._create_workspace_directories()
-            self._handle_sources()
-            self._handle_build()
-            self._handle_check()
-            self._handle_package()
+            # The binary hash is only needed for packaging; it is computed while the sources are handled and built
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                binary_hash = executor.submit(self._compute_binary_hash)
+
+                self._create_workspace_directories()
+                self._handle_sources()
+                self._handle_build()
+                self._handle_check()
+                self._handle_package(binary_hash.result())
         except Exception as e:
             raise
         finally:
@@ -97,17 +123,18 @@ class RecipeContext:
 
         if exists(workspace_path):
             if self.configuration.package_delete_workspace:
-                logger.verbose(f"Removing existing workspace {workspace_path}")
+                logger.verbose("Removing existing workspace %s", workspace_path)
                 rmtree(workspace_path)
             else:
                 raise Exception(f"Workspace '{workspace_path}' must not exist.")
 
         logger.debug("Creating workspace directories: %s", workspace_path)
 
+        # Only the workspace itself can have missing parents; the directories inside it can be created directly
         makedirs(workspace_path)
-        makedirs(self.source_directory)
-        makedirs(self.build_directory)
-        makedirs(self.package_directory)
+        mkdir(self.source_directory)
+        mkdir(self.build_directory)
+        mkdir(self.package_directory)
 
     def _handle_sources(self):
         logger.info("Handle sources...")
@@ -119,12 +146,12 @@ class RecipeContext:
         if len(self.description.sources) == 0:
             return
 
-        for source, sha256sum in zip(self.description.sources, self.description.sha256sums):
-            filename = self._download_source_file(source, sha256sum)
-
-            if is_tarfile(filename):
+        # Extracting is disk bound and stays serial, in the order of the sources, so later sources still overwrite
+        # earlier ones.
+        for filename in self._download_source_files():
+            if is_tar_archive(self.configuration, Path(filename)):
                 logger.info(f"Extracting file {basename(filename)}...")
-                extract_tar(Path(filename), self.source_directory)
+                extract_tar(self.configuration, Path(filename), self.source_directory)
 
         self._call_script_function(function_name="handle_sources", working_dir=self.source_directory)
 
@@ -157,39 +184,66 @@ class RecipeContext:
         self._call_script_function(function_name="handle_check", working_dir=self.build_directory,
                                    print_output=not self.configuration.suppress_build_output)
 
-    def _handle_package(self):
+    def _handle_package(self, binary_hash: str):
         """
         This function will call the handle_package function in the package script, if it exists.
-        After that it will package the built package into a tar.xz archive to serve as the binary cache.
+        After that it will package the built package into a tar.gz archive to serve as the binary cache.
+
+        Args:
+            binary_hash (str): The hash of the package script and options, see _compute_binary_hash
         """
 
         output_archive = join(self.configuration.package_artifact_path,
                               f"{self.description.name}-{self.description.version}-"
                               f"{self.description.release}{self.configuration.package_file_extension}")
 
+        pigz_executable = self.configuration.pigz_executable
+
+        # pigz compresses with all cores and writes the same gzip format as tar -z. Listing every file is left out,
+        # since that can be a lot of output for large packages.
+        if pigz_executable and access(pigz_executable, X_OK):
+            tar_arguments = f"--use-compress-program={pigz_executable} -cf"
+        else:
+            tar_arguments = "-czf"
+
         logger.info("Packaging package...")
+
+        # Written from Python before the package script runs; tar has to run in the same fakeroot session as the
+        # package function, so it can't be split off into a separate shell
+        with open(join(self.package_directory, ".hash"), "w") as file:
+            file.write(f"{binary_hash}\n")
+
+        with open(join(self.package_directory, ".package_info"), "w") as file:
+            file.write(self._get_package_info())
+
         self._call_script_function(function_name="handle_package", working_dir=self.build_directory, post_script=f'''
-                {get_alpaca_tool_command("apcommand")} fileinfo {self.package_directory}
-
-                echo {self._compute_binary_hash()} > {self.package_directory}/.hash 
-
-                {self.configuration.cat_executable} > {self.package_directory}/.package_info <<EOF
-# Generated by Aleya Linux Alpaca {__version__}
-name="{self.description.name}"
-version="{self.description.version}"
-release="{self.description.release}"
-url="{self.description.url}"
-licenses=({" ".join(self.description.licenses)})
-dependencies=({" ".join(self.description.dependencies)})
-build_dependencies=({" ".join(self.description.build_dependencies)})
-sources=({" ".join(self.description.sources)})
-sha256sums=({" ".join(self.description.sha256sums)})
-package_options=({" ".join(self.description.available_options)})
-EOF
-
-                {self.configuration.tar_executable} -czvf {output_archive} -C {self.package_directory} .
+                {self._apcommand} fileinfo {self.package_directory}
+
+                {self.configuration.tar_executable} {tar_arguments} {output_archive} -C {self.package_directory} .
             ''', print_output=not self.configuration.suppress_build_output, use_fakeroot=True)
 
+    def _get_package_info(self) -> str:
+        """
+        Get the contents of the .package_info file, which describes the package in the same format as a recipe
+
+        Returns:
+            str: The contents of the .package_info file
+        """
+
+        description = self.description
+
+        return (f"# Generated by Aleya Linux Alpaca {get_alpaca_version()}\n"
+                f"name=\"{description.name}\"\n"
+                f"version=\"{description.version}\"\n"
+                f"release=\"{description.release}\"\n"
+                f"url=\"{description.url}\"\n"
+                f"licenses=({' '.join(description.licenses)})\n"
+                f"dependencies=({' '.join(description.dependencies)})\n"
+                f"build_dependencies=({' '.join(description.build_dependencies)})\n"
+                f"sources=({' '.join(description.sources)})\n"
+                f"sha256sums=({' '.join(description.sha256sums)})\n"
+                f"package_options=({' '.join(description.available_options)})\n")
+
     def _delete_workspace_directories(self):
         """
         Clean up the workspace directories created for this recipe context.
@@ -207,28 +261,28 @@ EOF
 
         rmtree(self.configuration.package_workspace_path)
 
-    @property
+    @cached_property
     def recipe_directory(self) -> Path:
         """
         Get the path where the recipe is located.
         """
         return Path(self.recipe_path).parent
 
-    @property
+    @cached_property
     def source_directory(self) -> Path:
         """
         Get the path where the source files are located.
         """
         return Path(self.configuration.package_workspace_path, "source")
 
-    @property
+    @cached_property
     def build_directory(self) -> Path:
         """
         Get the path where the build files are located.
         """
         return Path(self.configuration.package_workspace_path, "build")
 
-    @property
+    @cached_property
     def package_directory(self) -> Path:
         """
         Get the path where the package files are located.
@@ -244,26 +298,55 @@ EOF
             str: The hash of the package script and options
         """
 
-        with open(self.recipe_path, "r") as file:
-            package_script = file.read()
+        # The modification time and size are part of the cache key, so a changed recipe is hashed again
+        return _compute_binary_hash(str(self.recipe_path), self._recipe_stat.st_mtime_ns, self._recipe_stat.st_size,
+                                    self.configuration.target_architecture)
+
+    def _read_package_variables(self, early_env: dict[str, str]) -> dict[str, str]:
+        """
+        Read the variables that describe the package from the recipe, printed separated by a NUL character, in a
+        single shell.
+
+        The recipe is sourced twice: first to resolve the name, version and release, and again once those are
+        exported, so the other variables can refer to them even if they are assigned later in the recipe or are
+        functions.
+
+        Args:
+            early_env (dict[str, str]): The environment to source the recipe with, before its name and version are known
+
+        Returns:
+            dict[str, str]: The value of each package variable. Arrays are separated by newlines.
+        """
 
-        hash_object = hashlib.sha256()
-        hash_object.update(package_script.encode("utf-8"))
-        hash_object.update(self.configuration.target_architecture.encode("utf-8"))
+        early_variables = ["name", "version", "release"]
+        variables = [*early_variables, "url", *_package_array_variables]
+        source_command = f'source "{str(self.recipe_path)}"'
 
-        # Left for future use if options are needed
-        # for key in sorted(self.options.keys()):
-        #    hash_object.update(key.encode("utf-8"))
-        #    hash_object.update(str(self.options[key]).encode("utf-8"))
+        commands = [source_command]
 
-        return hash_object.hexdigest()
+        for variable in early_variables:
+            commands.append(f'_alpaca_{variable}="$({self._get_package_variable_command(variable, is_array=False)})"'
+                            ' || exit 1')
+            commands.append(f"printf '%s\\0' \"$_alpaca_{variable}\"")
 
-    def _read_package_variable(self, path: Path, variable: str, env: dict[str, str] | None = None,
-                               is_array: bool = False) -> str:
+        commands.append('export name="$_alpaca_name" version="$_alpaca_version" release="$_alpaca_release"')
+        commands.append(source_command)
+
+        for variable in variables[len(early_variables):]:
+            commands.append(self._get_package_variable_command(variable,
+                                                               is_array=variable in _package_array_variables))
+            commands.append("printf '\\0'")
+
+        output = ShellCommand.exec_get_value(configuration=self.configuration, command="\n".join(commands),
+                                             environment=early_env)
+
+        return dict(zip(variables, (value.strip() for value in output.split("\0"))))
+
+    @staticmethod
+    def _get_package_variable_command(variable: str, is_array: bool) -> str:
         var_ref = f"${{{variable}[@]}}" if is_array else f"${{{variable}}}"
 
-        command = f'''
-            source "{str(path)}"
+        return f'''
             if declare -f {variable} >/dev/null && declare -p {variable} >/dev/null; then
                 echo "Error: both a variable and a function named '{variable}' are defined" >&2
                 exit 1
@@ -277,8 +360,6 @@ EOF
             fi
         '''
 
-        return ShellCommand.exec_get_value(configuration=self.configuration, command=command, environment=env)
-
     def _call_script_function(self, function_name: str, working_dir: Path, pre_script: str | None = None,
                               post_script: str | None = None, print_output: bool = True, use_fakeroot: bool = False):
         """
@@ -293,7 +374,7 @@ EOF
             use_fakeroot (bool, optional): Whether to use fakeroot for the command. Defaults to False.
         """
 
-        logger.verbose(f"Calling function {function_name} in package script from {working_dir}")
+        logger.verbose("Calling function %s in package script from %s", function_name, working_dir)
 
         ShellCommand.exec(configuration=self.configuration, command=f'''
                 source {self.recipe_path}
@@ -307,10 +388,7 @@ EOF
                 fi
 
                 {post_script if post_script else ''}
-            ''', working_directory=working_dir,
-                          environment=self._get_environment_variables(self.description.name,
-                                                                      str(self.description.version),
-                                                                      self.description.release),
+            ''', working_directory=working_dir, environment=self._env,
                           print_output=print_output,
                           throw_on_error=True, use_fakeroot=use_fakeroot)
 
@@ -323,8 +401,9 @@ EOF
             dict[str, str]: The environment variables for the recipe.
         """
 
-        env = {"alpaca_build": "1", "alpaca_version": __version__, "source_directory": join(self.source_directory),
-               "build_directory": join(self.build_directory), "package_directory": join(self.package_directory),
+        env = {"alpaca_build": "1", "alpaca_version": get_alpaca_version(),
+               "source_directory": str(self.source_directory), "build_directory": str(self.build_directory),
+               "package_directory": str(self.package_directory),
                "target_architecture": self.configuration.target_architecture, "target_platform": "linux",
                "c_flags": self.configuration.c_flags, "cpp_flags": self.configuration.cpp_flags,
                "ld_flags": self.configuration.ld_flags, "make_flags": self.configuration.make_flags,
@@ -341,13 +420,47 @@ EOF
 
         return env
 
-    def _download_source_file(self, source: str, sha256sum: str) -> str:
+    def _download_source_files(self) -> Iterator[str]:
+        """
+        Download all source files to the source directory, in the order of the sources.
+
+        Downloads are mostly spent waiting on the network, so they run concurrently. Every source is written to the
+        source directory under its file name though, so sources that share a file name are downloaded one at a time
+        instead. The next source is then only downloaded after the previous one has been handled.
+
+        Yields:
+            str: The full path to each downloaded file
+        """
+
+        sources = self.description.sources
+        file_names = [_get_source_file_name(source) for source in sources]
+
+        if len(set(file_names)) != len(file_names):
+            logger.debug("Sources share a file name. Downloading them one at a time.")
+
+            for source, sha256sum in zip(sources, self.description.sha256sums):
+                yield self._download_source_file(source, sha256sum, self.configuration.show_download_progress)
+
+            return
+
+        # Progress bars of concurrent downloads would overwrite each other
+        show_progress = self.configuration.show_download_progress and len(sources) == 1
+
+        with ThreadPoolExecutor(max_workers=min(_max_parallel_downloads, len(sources))) as executor:
+            futures = [executor.submit(self._download_source_file, source, sha256sum, show_progress)
+                       for source, sha256sum in zip(sources, self.description.sha256sums)]
+
+            for future in futures:
+                yield future.result()
+
+    def _download_source_file(self, source: str, sha256sum: str, show_progress: bool = True) -> str:
         """
         Download a source file to the source directory and verify the sha256 sum.
 
         Args:
             source (str): The path or url of the source file
             sha256sum (str): The expected sha256 sum of the source file
+            show_progress (bool, optional): Whether to show a progress bar while downloading. Defaults to True.
 
         Raises:
             ValueError: If the source file does not exist or the sha256 sum does not match
@@ -360,22 +473,32 @@ EOF
 
         # If the source is a URL
         if urlparse(source).scheme != "":
-            logger.verbose(f"Source {source} is a URL. Downloading.")
-            download_file(self.configuration, source, self.source_directory,
-                          show_progress=self.configuration.show_download_progress)
-        # If not, check if it is a full path
-        elif isfile(source):
-            logger.verbose(f"Source {source} is a direct path. Copying.")
-            shutil.copy(source, self.source_directory)
-        # If not, look relative to the package directory
-        elif isfile(join(self.recipe_directory, source)):
-            logger.verbose(f"Source {source} is relative to the recipe directory")
-            shutil.copy(join(self.recipe_directory, source), self.source_directory, )
-
-        file_path = join(self.source_directory, basename(source))
-
-        # Check the hash of the file
-        if not check_file_hash_from_string(file_path, sha256sum):
+            logger.verbose("Source %s is a URL. Downloading.", source)
+            file_path, file_hash = download_file(self.configuration, source, self.source_directory,
+                                                 show_progress=show_progress)
+        else:
+            # If not, check if it is a full path. If not, look relative to the package directory
+            if isfile(source):
+                logger.verbose("Source %s is a direct path. Copying.", source)
+                source_path = source
+            elif isfile(join(self.recipe_directory, source)):
+                logger.verbose("Source %s is relative to the recipe directory", source)
+                source_path = join(self.recipe_directory, source)
+            else:
+                logger.error(f"File {source} does not exist. Could not verify sha256 hash.")
+                raise ValueError(f"Source {source} hash mismatch. Expected {sha256sum}")
+
+            file_path = join(self.source_directory, basename(source))
+
+            # Copying a file onto itself would truncate it before it is read
+            if exists(file_path) and samefile(source_path, file_path):
+                logger.verbose("Source %s is already in the source directory", source)
+                file_hash = get_file_hash(file_path)
+            else:
+                file_hash = copy_file_with_hash(source_path, file_path)
+
+        # The hash was calculated while the file was written, so the file doesn't need to be read again
+        if not check_hash_from_string(file_path, file_hash, sha256sum):
             raise ValueError(f"Source {source} hash mismatch. Expected {sha256sum}")
 
         return file_path
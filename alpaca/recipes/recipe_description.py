@@ -1,24 +1,26 @@
+from dataclasses import dataclass
+
 from alpaca.recipes.version import Version
 
 
+@dataclass(frozen=True, slots=True)
 class RecipeDescription:
     """
     A class to represent a description for a package recipe.
     """
 
-    def __init__(self, name: str, version: Version, release:str , url: str, licenses: list[str], dependencies: list[str],
-            build_dependencies: list[str], sources: list[str], sha256sums: list[str], available_options: list[str]):
-        self.name = name
-        self.version = version
-        self.release = release
-        self.url = url
-        self.licenses = licenses
-        self.dependencies = dependencies
-        self.build_dependencies = build_dependencies
-        self.sources = sources
-        self.sha256sums = sha256sums
-        self.available_options = available_options
+    name: str
+    version: Version
+    release: str
+    url: str
+    licenses: tuple[str, ...]
+    dependencies: tuple[str, ...]
+    build_dependencies: tuple[str, ...]
+    sources: tuple[str, ...]
+    sha256sums: tuple[str, ...]
+    available_options: tuple[str, ...]
 
-        if len(sources) != len(sha256sums):
+    def __post_init__(self):
+        if len(self.sources) != len(self.sha256sums):
             raise ValueError(
-                f"Number of sources ({len(sources)}) does not match number of sha256sums ({len(sha256sums)})")
+                f"Number of sources ({len(self.sources)}) does not match number of sha256sums ({len(self.sha256sums)})")
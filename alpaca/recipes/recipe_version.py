@@ -25,6 +25,9 @@ class RecipeVersion:
 
         return self.version == other.version and self.release == other.release
 
+    def __hash__(self):
+        return hash((self.version, self.release))
+
     def __lt__(self, other):
         if not isinstance(other, RecipeVersion):
             return NotImplemented
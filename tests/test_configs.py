@@ -1,3 +1,79 @@
+from configparser import ConfigParser, Error as ConfigParserError
+from pathlib import Path
+
+import pytest
+
+from alpaca.configuration.configuration import _get_config_boolean, _parse_config_file
+
+_repository_config_path = Path(__file__).parent.parent / "alpaca.conf"
+
+
+def _read_with_config_parser(path: Path, **kwargs) -> dict[str, dict[str, str]]:
+    config = ConfigParser(**kwargs)
+    config.read(path, encoding="utf-8")
+    return {section: dict(config[section]) for section in config.sections()}
+
 
 def test_dummy():
     pass
+
+
+def test_parse_config_file_matches_config_parser():
+    assert _parse_config_file(str(_repository_config_path)) == _read_with_config_parser(_repository_config_path)
+
+
+@pytest.mark.parametrize("word", ["1", "yes", "true", "on", "0", "no", "false", "off", "Yes", "TRUE", "Off"])
+def test_boolean_words_match_config_parser(tmp_path, word):
+    path = tmp_path / "alpaca.conf"
+    path.write_text(f"[general]\nsuppress_build_output = {word}\n", encoding="utf-8")
+
+    config = ConfigParser()
+    config.read(path, encoding="utf-8")
+
+    assert _get_config_boolean(_parse_config_file(str(path)), "general", "suppress_build_output") == \
+        config.getboolean("general", "suppress_build_output")
+
+
+def test_invalid_boolean_raises(tmp_path):
+    path = tmp_path / "alpaca.conf"
+    path.write_text("[general]\nsuppress_build_output = maybe\n", encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        _get_config_boolean(_parse_config_file(str(path)), "general", "suppress_build_output")
+
+
+def test_percent_in_value_is_read_as_is(tmp_path):
+    path = tmp_path / "alpaca.conf"
+    path.write_text("[build]\nC_Flags = -O2 -DFORMAT=\"%d\"\nld_flags: -Wl,--as-needed\n# comment\n; comment\n",
+                    encoding="utf-8")
+
+    values = _parse_config_file(str(path))
+
+    assert values == _read_with_config_parser(path, interpolation=None)
+    assert values["build"]["c_flags"] == "-O2 -DFORMAT=\"%d\""
+
+
+@pytest.mark.parametrize("content", [
+    "[general]\nsuppress_build_output = true\nsuppress_build_output = false\n",
+    "[general]\nsuppress_build_output = true\nSuppress_Build_Output = false\n",
+    "[general]\nsuppress_build_output = true\n[general]\nshow_download_progress = true\n",
+])
+def test_duplicates_raise(tmp_path, content):
+    path = tmp_path / "alpaca.conf"
+    path.write_text(content, encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        _parse_config_file(str(path))
+
+    # ConfigParser rejects the same files
+    with pytest.raises(ConfigParserError):
+        _read_with_config_parser(path)
+
+
+@pytest.mark.parametrize("content", ["suppress_build_output = true\n", "[general]\nsuppress_build_output\n"])
+def test_invalid_lines_raise(tmp_path, content):
+    path = tmp_path / "alpaca.conf"
+    path.write_text(content, encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        _parse_config_file(str(path))